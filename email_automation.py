@@ -12,7 +12,9 @@ from string import Template
 import os
 from dotenv import load_dotenv
 from emailsender import EmailSender
+from import_contacts import normalize_email, retire_delta
 import glob
+import argparse
 
 @dataclass
 class EmailConfig:
@@ -90,9 +92,14 @@ class EmailCampaign:
             self.logger.error(f"Configuration error: {str(e)}")
             raise
 
-    async def process_contacts(self, contacts_file: str) -> Dict[str, int]:
-        """Process contacts from Excel/CSV file and send emails."""
-        results = {'total': 0, 'successful': 0, 'failed': 0, 'skipped': 0}
+    async def process_contacts(self, contacts_file: str, delta_file: Optional[str] = None) -> Dict[str, int]:
+        """Process contacts from Excel/CSV file and send emails.
+
+        If delta_file is given (as written by import_contacts.py), only pending
+        contacts listed in it are processed, and the delta is renamed aside
+        once the run completes.
+        """
+        results = {'total': 0, 'successful': 0, 'failed': 0, 'skipped': 0, 'not_in_delta': 0}
         
         try:
             # Read the contacts file
@@ -105,8 +112,16 @@ class EmailCampaign:
                 self.logger.info(f"Sample row data: {df.iloc[0].to_dict()}")
             
             # Only process contacts with pending status
-            pending_contacts = df[df['status'].str.lower() == 'pending'].copy()
-            results['skipped'] = len(df) - len(pending_contacts)
+            pending_mask = df['status'].str.lower() == 'pending'
+            results['skipped'] = int((~pending_mask).sum())
+            if delta_file:
+                delta_emails = set(normalize_email(e) for e in
+                                   pd.read_csv(delta_file, usecols=['email'], dtype=str)['email'])
+                in_delta = df['email'].map(normalize_email).isin(delta_emails)
+                results['not_in_delta'] = int((pending_mask & ~in_delta).sum())
+                pending_mask &= in_delta
+                self.logger.info(f"Limiting campaign to {len(delta_emails)} contacts from {delta_file}")
+            pending_contacts = df[pending_mask].copy()
             
             for batch_start in range(0, len(pending_contacts), self.config.batch_size):
                 batch = pending_contacts.iloc[batch_start:batch_start + self.config.batch_size]
@@ -240,19 +255,33 @@ class EmailCampaign:
         except Exception as e:
             self.logger.error(f"Campaign error: {str(e)}")
             raise
+
+        if delta_file:
+            # The delta has been consumed; the next import starts a fresh one
+            retired = retire_delta(delta_file)
+            if retired:
+                self.logger.info(f"Retired delta file {delta_file} to {retired}")
             
         return results
 
 async def main():
     # Example usage
+    parser = argparse.ArgumentParser(description='Run the email campaign.')
+    parser.add_argument('--contacts', default='contacts.xlsx',
+                        help='Contacts file (XLSX or CSV) to send to (default: contacts.xlsx)')
+    parser.add_argument('--delta', help='Only send to contacts recorded in this import delta file')
+    args = parser.parse_args()
+
     campaign = EmailCampaign('config.json')
-    results = await campaign.process_contacts('contacts.xlsx')
+    results = await campaign.process_contacts(args.contacts, delta_file=args.delta)
     
     print("\nCampaign Results:")
     print(f"Total emails attempted: {results['total']}")
     print(f"Successfully sent: {results['successful']}")
     print(f"Failed: {results['failed']}")
     print(f"Skipped (already sent): {results['skipped']}")
+    if args.delta:
+        print(f"Pending but not in delta: {results['not_in_delta']}")
 
 if __name__ == "__main__":
     asyncio.run(main()) 
\ No newline at end of file
@@ -0,0 +1,429 @@
+import argparse
+import csv
+import datetime
+import heapq
+import json
+import os
+import re
+import shutil
+import tempfile
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from openpyxl import Workbook, load_workbook
+
+# Columns that carry send history and must never be overwritten by an import
+HISTORY_COLUMNS = ('status', 'email_sent_date')
+DELTA_COLUMNS = ['email', 'change', 'changed_fields']
+_INTEGRAL_FLOAT = re.compile(r'^-?\d+\.0+$')
+# Header spellings (after _column_key) that exports use for the email column
+_EMAIL_HEADERS = {'email', 'e_mail', 'email_address', 'e_mail_address', 'mail'}
+# Rows per worksheet in .xlsx, including the header row
+EXCEL_MAX_ROWS = 1048576
+
+
+def normalize_email(value: Any) -> str:
+    """Normalise an email address for matching (trimmed, lower-cased)."""
+    if value is None:
+        return ''
+    return str(value).strip().lower()
+
+
+def _column_key(name: str) -> str:
+    """Canonical key for a header so 'First Name' matches 'first_name'."""
+    key = re.sub(r'[\s\-_]+', '_', name.strip().lower()).strip('_')
+    return 'email' if key in _EMAIL_HEADERS else key
+
+
+def _cell_to_str(value: Any) -> str:
+    """Convert a spreadsheet cell value to a string."""
+    return '' if value is None else str(value)
+
+
+def _normalize_value(value: Any) -> str:
+    """Normalise a cell value for comparison between history and import.
+
+    pandas writes integer columns containing blanks as floats, so 12345.0 in
+    the history must still equal 12345 in an export.
+    """
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, str):
+        value = value.strip()
+        if _INTEGRAL_FLOAT.match(value):
+            return value.split('.')[0]
+        return value
+    return _cell_to_str(value)
+
+
+def _encode(value: Any) -> Any:
+    # Spreadsheet cells may hold dates and times, which JSON cannot carry
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {'__time__': value.isoformat()}
+    if isinstance(value, datetime.timedelta):
+        return {'__timedelta__': value.total_seconds()}
+    return str(value)
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if '__datetime__' in obj:
+        return datetime.datetime.fromisoformat(obj['__datetime__'])
+    if '__date__' in obj:
+        return datetime.date.fromisoformat(obj['__date__'])
+    if '__time__' in obj:
+        return datetime.time.fromisoformat(obj['__time__'])
+    if '__timedelta__' in obj:
+        return datetime.timedelta(seconds=obj['__timedelta__'])
+    return obj
+
+
+def _dumps(record: List[Any]) -> str:
+    return json.dumps(record, default=_encode) + '\n'
+
+
+def _is_excel(path: str) -> bool:
+    return path.lower().endswith(('.xlsx', '.xlsm'))
+
+
+def _read_header(path: str) -> List[str]:
+    """Read only the header row of a CSV/XLSX contacts file."""
+    if _is_excel(path):
+        wb = load_workbook(path, read_only=True)
+        try:
+            first = next(wb.active.iter_rows(max_row=1, values_only=True), ())
+        finally:
+            wb.close()
+        return [_cell_to_str(c).strip() for c in first]
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        return [c.strip() for c in next(csv.reader(f), [])]
+
+
+def _iter_rows(path: str) -> Iterator[Dict[str, Any]]:
+    """Stream rows of a CSV/XLSX contacts file as dicts keyed by _column_key.
+
+    Excel cells keep their original types (numbers, dates) so untouched
+    columns are written back exactly as they were read.
+    """
+    header = [_column_key(h) for h in _read_header(path)]
+    if _is_excel(path):
+        wb = load_workbook(path, read_only=True)
+        try:
+            for values in wb.active.iter_rows(min_row=2, values_only=True):
+                if all(v is None for v in values):
+                    continue
+                yield {col: ('' if v is None else v) for col, v in zip(header, values) if col}
+        finally:
+            wb.close()
+    else:
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            for values in reader:
+                if not any(values):
+                    continue
+                yield {col: v for col, v in zip(header, values) if col}
+
+
+class _RowWriter:
+    """Streaming writer for CSV or write-only XLSX output.
+
+    ``columns`` are the row keys to write and ``header`` the names written
+    in the header row.
+    """
+    def __init__(self, path: str, columns: List[str], header: List[str], excel: bool) -> None:
+        self.path = path
+        self.columns = columns
+        self.excel = excel
+        if excel:
+            self._wb = Workbook(write_only=True)
+            self._ws = self._wb.create_sheet()
+            self._ws.append(header)
+        else:
+            self._file = open(path, 'w', newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(header)
+
+    def write(self, row: Dict[str, Any]) -> None:
+        values = [row.get(col, '') for col in self.columns]
+        if self.excel:
+            self._ws.append(values)
+        else:
+            self._writer.writerow(values)
+
+    def close(self) -> None:
+        if self.excel:
+            self._wb.save(self.path)
+        else:
+            self._file.close()
+
+
+def _partition_of(email: str, partitions: int) -> int:
+    # crc32 rather than hash() so partitioning is stable across runs
+    return zlib.crc32(email.encode('utf-8')) % partitions
+
+
+def _spill(rows: Iterator[Tuple[int, str, Dict[str, Any]]], prefix: str,
+           workdir: str, partitions: int) -> List[str]:
+    """Scatter (seq, email, row) records into on-disk hash partitions."""
+    paths = [os.path.join(workdir, f'{prefix}_{i}.jsonl') for i in range(partitions)]
+    files = [open(p, 'w', encoding='utf-8') for p in paths]
+    try:
+        for seq, email, row in rows:
+            files[_partition_of(email, partitions)].write(_dumps([seq, email, row]))
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def _read_jsonl(path: str) -> Iterator[List[Any]]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line, object_hook=_decode)
+
+
+def _iter_previous_delta(delta_file: str) -> Iterator[Dict[str, str]]:
+    """Stream rows of an existing delta file so they survive a re-import."""
+    if not os.path.exists(delta_file):
+        return
+    with open(delta_file, 'r', newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            if normalize_email(row.get('email')):
+                yield row
+
+
+def retire_delta(delta_file: str) -> Optional[str]:
+    """Move a consumed delta aside so the next import starts a fresh one.
+
+    The file is renamed to ``<name>.<timestamp><ext>`` and the new path is
+    returned, or None if there was no delta to retire.
+    """
+    if not os.path.exists(delta_file):
+        return None
+    base, ext = os.path.splitext(delta_file)
+    retired = f"{base}.{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{ext}"
+    os.replace(delta_file, retired)
+    return retired
+
+
+def _merge_row(existing: Dict[str, Any], incoming: Dict[str, Any]) -> List[str]:
+    """Refresh profile fields of an existing contact in place.
+
+    Send history columns are left untouched and blank incoming values never
+    clear existing data. Returns the names of the columns that changed.
+    """
+    changed = []
+    for col, value in incoming.items():
+        if col == 'email' or col in HISTORY_COLUMNS:
+            continue
+        normalized = _normalize_value(value)
+        if normalized == '':
+            continue
+        if _normalize_value(existing.get(col, '')) != normalized:
+            existing[col] = value
+            changed.append(col)
+    return changed
+
+
+def import_contacts(
+    import_file: str,
+    contacts_file: str = 'contacts.xlsx',
+    delta_file: str = 'contacts_delta.csv',
+    partitions: int = 64
+) -> Dict[str, int]:
+    """Merge a contact export into the existing contacts file.
+
+    Contacts are matched on normalised email with a partitioned hash join:
+    both inputs are streamed into on-disk hash partitions, each partition is
+    joined in memory (built from the import side, probed with the history
+    side) and the results are merged back into the original row order. Memory
+    use is bounded by the size of a single import partition, not by the size
+    of either file.
+
+    Existing contacts keep their status and email_sent_date; new contacts are
+    appended as pending. Added and updated contacts are written to
+    ``delta_file`` so the next campaign run can be limited to them. Rows
+    already in ``delta_file`` from an earlier import are kept, so importing
+    twice before a campaign run loses nothing; the campaign retires the
+    delta with retire_delta() once it has consumed it.
+    """
+    if partitions < 1:
+        raise ValueError(f"partitions must be at least 1, got {partitions}")
+
+    results = {'existing': 0, 'added': 0, 'updated': 0, 'unchanged': 0, 'skipped': 0}
+
+    history_exists = os.path.exists(contacts_file)
+    history_header = _read_header(contacts_file) if history_exists else []
+    import_header = _read_header(import_file)
+    if 'email' not in [_column_key(h) for h in import_header]:
+        raise ValueError(f"Import file {import_file} has no 'email' column")
+
+    # Headers are matched on _column_key; the history keeps its own spelling,
+    # new columns take the export's, and the columns the campaign relies on
+    # are always written under their canonical names
+    columns: List[str] = []
+    header: List[str] = []
+    for name, from_history in ([(h, True) for h in history_header] +
+                               [(h, False) for h in import_header] +
+                               [(c, False) for c in ('email',) + HISTORY_COLUMNS]):
+        key = _column_key(name)
+        if not key or key in columns:
+            continue
+        columns.append(key)
+        if not from_history and (key == 'email' or key in HISTORY_COLUMNS):
+            header.append(key)
+        else:
+            header.append(name.strip())
+
+    # Keep scratch files beside the contacts file so the final replace is atomic
+    workdir = tempfile.mkdtemp(prefix='contact_import_',
+                               dir=os.path.dirname(os.path.abspath(contacts_file)))
+    try:
+        history_count = 0
+
+        def history_records() -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+            nonlocal history_count
+            if not history_exists:
+                return
+            for row in _iter_rows(contacts_file):
+                yield history_count, normalize_email(row.get('email')), row
+                history_count += 1
+
+        def import_records() -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+            # Sequence numbers are offset by the history length at join time so
+            # new contacts are appended after existing ones
+            for seq, row in enumerate(_iter_rows(import_file)):
+                email = normalize_email(row.get('email'))
+                if not email:
+                    results['skipped'] += 1
+                    continue
+                yield seq, email, row
+
+        history_parts = _spill(history_records(), 'history', workdir, partitions)
+        import_parts = _spill(import_records(), 'import', workdir, partitions)
+        results['existing'] = history_count
+
+        merged_parts = []
+        delta_parts = []
+        for i in range(partitions):
+            # Build side: the import partition, deduplicated on email (first wins)
+            incoming: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+            for seq, email, row in _read_jsonl(import_parts[i]):
+                if email in incoming:
+                    results['skipped'] += 1
+                else:
+                    incoming[email] = (seq, row)
+
+            merged_path = os.path.join(workdir, f'merged_{i}.jsonl')
+            delta_path = os.path.join(workdir, f'delta_{i}.jsonl')
+            with open(merged_path, 'w', encoding='utf-8') as out, \
+                    open(delta_path, 'w', encoding='utf-8') as delta:
+                # Probe side: history rows in their original order
+                for seq, email, row in _read_jsonl(history_parts[i]):
+                    match = incoming.pop(email, None) if email else None
+                    if match is not None:
+                        changed = _merge_row(row, match[1])
+                        if changed:
+                            results['updated'] += 1
+                            delta.write(_dumps([seq, row['email'], 'updated', changed]))
+                        else:
+                            results['unchanged'] += 1
+                    out.write(_dumps([seq, row]))
+
+                for seq, row in sorted(incoming.values(), key=lambda item: item[0]):
+                    new_row = {col: v for col, v in row.items() if col not in HISTORY_COLUMNS}
+                    new_row['email'] = _cell_to_str(new_row['email']).strip()
+                    new_row['status'] = 'pending'
+                    new_row['email_sent_date'] = ''
+                    results['added'] += 1
+                    delta.write(_dumps([history_count + seq, new_row['email'], 'added', []]))
+                    out.write(_dumps([history_count + seq, new_row]))
+            merged_parts.append(merged_path)
+            delta_parts.append(delta_path)
+
+        total_rows = history_count + results['added']
+        if _is_excel(contacts_file) and total_rows + 1 > EXCEL_MAX_ROWS:
+            raise ValueError(
+                f"Merged contacts ({total_rows} rows) exceed the Excel limit of "
+                f"{EXCEL_MAX_ROWS - 1} data rows; use a CSV contacts file instead"
+            )
+
+        # Write both outputs to temporary files first so a failed import never
+        # truncates history or leaves a merge without its delta
+        output_tmp = os.path.join(workdir, 'output' + os.path.splitext(contacts_file)[1])
+        writer = _RowWriter(output_tmp, columns, header, _is_excel(contacts_file))
+        try:
+            streams = [_read_jsonl(p) for p in merged_parts]
+            for _, row in heapq.merge(*streams, key=lambda item: item[0]):
+                writer.write(row)
+        finally:
+            writer.close()
+
+        # The delta's temp file lives beside the delta itself so os.replace
+        # stays atomic even when it is on a different filesystem to workdir
+        delta_fd, delta_tmp = tempfile.mkstemp(
+            prefix='.contacts_delta_', suffix='.csv',
+            dir=os.path.dirname(os.path.abspath(delta_file)))
+        try:
+            with os.fdopen(delta_fd, 'w', newline='', encoding='utf-8') as f:
+                delta_writer = csv.writer(f)
+                delta_writer.writerow(DELTA_COLUMNS)
+                for row in _iter_previous_delta(delta_file):
+                    delta_writer.writerow([row.get(col, '') for col in DELTA_COLUMNS])
+                streams = [_read_jsonl(p) for p in delta_parts]
+                for _, email, change, changed in heapq.merge(*streams, key=lambda item: item[0]):
+                    delta_writer.writerow([email, change, ';'.join(changed)])
+            # Delta first: a delta listing contacts that are not merged yet is
+            # harmless, a merge without its delta loses the new contacts
+            os.replace(delta_tmp, delta_file)
+        except BaseException:
+            if os.path.exists(delta_tmp):
+                os.remove(delta_tmp)
+            raise
+        os.replace(output_tmp, contacts_file)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+def _positive_int(value: str) -> int:
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not an integer")
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description='Merge a contact export (CSV/XLSX) into the existing contacts file.'
+    )
+    parser.add_argument('import_file', help='CSV or XLSX export to import')
+    parser.add_argument('--contacts', default='contacts.xlsx',
+                        help='Existing contacts file to merge into (default: contacts.xlsx)')
+    parser.add_argument('--delta', default='contacts_delta.csv',
+                        help='Where to record added/updated contacts (default: contacts_delta.csv)')
+    parser.add_argument('--partitions', type=_positive_int, default=64,
+                        help='Number of on-disk hash partitions used for the merge (default: 64)')
+    args = parser.parse_args(argv)
+
+    results = import_contacts(args.import_file, args.contacts, args.delta, args.partitions)
+
+    print("\nImport Results:")
+    print(f"Existing contacts: {results['existing']}")
+    print(f"Added (pending): {results['added']}")
+    print(f"Updated: {results['updated']}")
+    print(f"Unchanged: {results['unchanged']}")
+    print(f"Skipped (missing or duplicate email): {results['skipped']}")
+    print(f"Changes recorded in {args.delta}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import csv
+import datetime
+
+import pytest
+from openpyxl import Workbook, load_workbook
+
+from import_contacts import import_contacts, main, retire_delta
+
+HISTORY_HEADER = ['email', 'first_name', 'phone', 'email_sent_date', 'status']
+
+
+def write_table(path, header, rows):
+    if str(path).endswith('.xlsx'):
+        wb = Workbook()
+        ws = wb.active
+        ws.append(header)
+        for row in rows:
+            ws.append(row)
+        wb.save(path)
+    else:
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+
+def read_table(path):
+    if str(path).endswith('.xlsx'):
+        rows = list(load_workbook(path).active.iter_rows(values_only=True))
+        header = rows[0]
+        return [dict(zip(header, ['' if v is None else v for v in row])) for row in rows[1:]]
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+@pytest.fixture(params=['csv', 'xlsx'])
+def history(request, tmp_path):
+    path = tmp_path / f'contacts.{request.param}'
+    write_table(path, HISTORY_HEADER, [
+        ['Alice@Example.com', 'Alice', '111', '2024-01-02 03:04:05', 'sent'],
+        ['', 'No Email', '', '', 'failed'],
+        ['bob@example.com', 'Bob', '222', '', 'pending'],
+    ])
+    return path
+
+
+def run_import(tmp_path, history, rows, header=('email', 'first_name', 'status')):
+    export = tmp_path / 'export.csv'
+    write_table(export, list(header), rows)
+    delta = tmp_path / 'delta.csv'
+    results = import_contacts(str(export), str(history), str(delta), partitions=4)
+    return results, read_table(history), read_table(delta)
+
+
+def test_matches_email_ignoring_case_and_whitespace(tmp_path, history):
+    results, contacts, delta = run_import(tmp_path, history, [
+        ['  alice@EXAMPLE.com ', 'Alice', ''],
+    ])
+
+    assert results['added'] == 0
+    assert results['unchanged'] == 1
+    assert len(contacts) == 3
+    assert delta == []
+
+
+def test_history_columns_are_never_overwritten(tmp_path, history):
+    results, contacts, delta = run_import(tmp_path, history, [
+        ['alice@example.com', 'Alicia', 'pending'],
+    ], header=('email', 'first_name', 'status'))
+
+    alice = contacts[0]
+    assert alice['first_name'] == 'Alicia'
+    assert alice['status'] == 'sent'
+    assert str(alice['email_sent_date']) == '2024-01-02 03:04:05'
+    assert delta == [{'email': 'Alice@Example.com', 'change': 'updated', 'changed_fields': 'first_name'}]
+
+
+def test_first_duplicate_in_import_wins(tmp_path, history):
+    results, contacts, delta = run_import(tmp_path, history, [
+        ['new@example.com', 'First', ''],
+        ['NEW@example.com', 'Second', ''],
+    ])
+
+    assert results['added'] == 1
+    assert results['skipped'] == 1
+    assert contacts[-1]['first_name'] == 'First'
+
+
+def test_blank_history_emails_are_kept(tmp_path, history):
+    _, contacts, _ = run_import(tmp_path, history, [
+        ['new@example.com', 'New', ''],
+        ['', 'Also No Email', ''],
+    ])
+
+    blanks = [c for c in contacts if c['email'] == '']
+    assert [c['first_name'] for c in blanks] == ['No Email']
+    assert blanks[0]['status'] == 'failed'
+
+
+def test_new_contacts_are_appended_pending_in_import_order(tmp_path, history):
+    results, contacts, delta = run_import(tmp_path, history, [
+        ['zed@example.com', 'Zed', 'sent'],
+        ['bob@example.com', 'Bob', ''],
+        ['amy@example.com', 'Amy', ''],
+    ])
+
+    assert results['added'] == 2
+    assert [c['email'] for c in contacts] == [
+        'Alice@Example.com', '', 'bob@example.com', 'zed@example.com', 'amy@example.com'
+    ]
+    assert [c['status'] for c in contacts[3:]] == ['pending', 'pending']
+    assert delta == [
+        {'email': 'zed@example.com', 'change': 'added', 'changed_fields': ''},
+        {'email': 'amy@example.com', 'change': 'added', 'changed_fields': ''},
+    ]
+
+
+def test_earlier_delta_rows_are_kept(tmp_path, history):
+    run_import(tmp_path, history, [['first@example.com', 'First', '']])
+    _, _, delta = run_import(tmp_path, history, [['second@example.com', 'Second', '']])
+
+    assert [row['email'] for row in delta] == ['first@example.com', 'second@example.com']
+
+
+def test_failed_delta_write_leaves_contacts_untouched(tmp_path, history):
+    before = history.read_bytes()
+    export = tmp_path / 'export.csv'
+    write_table(export, ['email'], [['z@x.com']])
+
+    with pytest.raises(OSError):
+        import_contacts(str(export), str(history), str(tmp_path / 'missing' / 'd.csv'))
+
+    assert history.read_bytes() == before
+
+
+def test_excel_cells_keep_types_and_integral_floats_match(tmp_path):
+    history = tmp_path / 'contacts.xlsx'
+    sent = datetime.datetime(2024, 1, 2, 3, 4, 5)
+    write_table(history, HISTORY_HEADER, [['a@example.com', 'Ann', 12345.5, sent, 'sent']])
+    wb = load_workbook(history)
+    wb.active['C2'] = 12345.0
+    wb.save(history)
+
+    results, contacts, delta = run_import(tmp_path, history, [['a@example.com', '12345']],
+                                          header=('email', 'phone'))
+
+    assert results['unchanged'] == 1
+    assert delta == []
+    assert contacts[0]['phone'] == 12345
+    assert contacts[0]['email_sent_date'] == sent
+
+
+def test_excel_row_limit_is_enforced(tmp_path, monkeypatch):
+    monkeypatch.setattr('import_contacts.EXCEL_MAX_ROWS', 3)
+    history = tmp_path / 'contacts.xlsx'
+    write_table(history, HISTORY_HEADER, [['a@example.com', 'Ann', '', '', 'sent']])
+    before = history.read_bytes()
+
+    with pytest.raises(ValueError, match='Excel limit'):
+        run_import(tmp_path, history, [['b@example.com', 'B', ''], ['c@example.com', 'C', '']])
+
+    assert history.read_bytes() == before
+
+
+@pytest.mark.parametrize('value', ['0', '-1', 'x'])
+def test_partitions_must_be_positive(value):
+    with pytest.raises(SystemExit):
+        main(['export.csv', '--partitions', value])
+
+
+def test_import_after_retired_delta_starts_fresh(tmp_path, history):
+    run_import(tmp_path, history, [['first@example.com', 'First', '']])
+    retired = retire_delta(str(tmp_path / 'delta.csv'))
+
+    _, _, delta = run_import(tmp_path, history, [['second@example.com', 'Second', '']])
+
+    assert [row['email'] for row in delta] == ['second@example.com']
+    assert [row['email'] for row in read_table(retired)] == ['first@example.com']
+    assert retire_delta(str(tmp_path / 'missing.csv')) is None
+
+
+def test_headers_match_ignoring_case_and_separators(tmp_path, history):
+    results, contacts, delta = run_import(tmp_path, history, [
+        ['alice@example.com', 'Alicia', 'pending'],
+        ['new@example.com', 'New', 'sent'],
+    ], header=('Email', 'First Name', 'STATUS'))
+
+    assert results['updated'] == 1
+    assert results['added'] == 1
+    assert list(contacts[0]) == HISTORY_HEADER
+    assert contacts[0]['first_name'] == 'Alicia'
+    assert contacts[0]['status'] == 'sent'
+    assert contacts[-1]['status'] == 'pending'
+    assert [row['change'] for row in delta] == ['updated', 'added']
+
+
+def test_email_address_header_on_new_history(tmp_path):
+    export = tmp_path / 'export.csv'
+    write_table(export, ['E-mail Address', 'Company'], [['a@example.com', 'Acme']])
+    contacts_file = tmp_path / 'contacts.csv'
+
+    import_contacts(str(export), str(contacts_file), str(tmp_path / 'delta.csv'))
+
+    assert read_table(contacts_file) == [
+        {'email': 'a@example.com', 'Company': 'Acme', 'status': 'pending', 'email_sent_date': ''}
+    ]